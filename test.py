@@ -9,15 +9,27 @@ __author__ = "William Huynh (@saturn691)"
 
 from pathlib import Path
 from dataclasses import dataclass
-from typing import List, Optional
+from typing import Any, Callable, Iterator, List, Optional, Tuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import os
+import select
+import signal
+import hashlib
 import json
+import shlex
 import shutil
 import subprocess
 import sys
+import tempfile
 import argparse
 import time
 
+# Optional, but parses and serialises JSON a lot faster
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 
 RED = "\033[31m"
 GREEN = "\033[32m"
@@ -34,11 +46,31 @@ OUTPUT_FOLDER = PROJECT_LOCATION.joinpath("bin").resolve()
 COMPILER_TEST_FOLDER = PROJECT_LOCATION.joinpath("tests").resolve()
 COMPILER_FILE = PROJECT_LOCATION.joinpath("target/debug/rrc").resolve()
 RESULTS_FILE = COMPILER_TEST_FOLDER.joinpath("expected.json").resolve()
+TEST_CACHE_FILE_NAME = ".test_cache.json"
 TEST_DRIVER = COMPILER_TEST_FOLDER.joinpath("test.rs").resolve()
 
+# Anything that `cargo build` would rebuild the compiler for
+COMPILER_SOURCES = [
+    PROJECT_LOCATION.joinpath("Cargo.toml"),
+    PROJECT_LOCATION.joinpath("Cargo.lock"),
+    PROJECT_LOCATION.joinpath("src"),
+    PROJECT_LOCATION.joinpath("crates"),
+]
+
+# Stringified once, rather than on every subprocess call
+COMPILER_FILE_STR = str(COMPILER_FILE)
+TEST_DRIVER_STR = str(TEST_DRIVER)
+
 BUILD_TIMEOUT_SECONDS = 60
 RUN_TIMEOUT_SECONDS = 15
 TIMEOUT_RETURNCODE = 124
+PIPELINES_PER_CORE = 2
+
+# Contents of RESULTS_FILE, in processes set up by `init_worker(...)`
+WORKER_EXPECTED_RESULTS = {}
+
+# Environment for the test subprocesses, built once rather than per test
+CUSTOM_ENV = {**os.environ, "ASAN_OPTIONS": "exitcode=0"}
 
 
 @dataclass
@@ -57,85 +89,112 @@ class Result:
         return f'{self.test_case_name}\n{RED}{timeout + self.error_log}{RESET}\n'
 
 
-def run_test(test_file: Path) -> Result:
+@dataclass
+class Stage:
+    description: str
+    component: str
+    cmd: List
+    timeout: int
+
+
+def test_log_path(test_file: Path, output_folder: Path) -> str:
     """
-    Runs an instance of a test case.
+    Where the artifacts and logs of a test case go, minus their extensions.
     """
-    test_name = test_file.relative_to(PROJECT_LOCATION)
-
-    # Relative path w.r.t. COMPILER_TEST_FOLDER
+    # Relative path w.r.t. COMPILER_TEST_FOLDER. `output_folder` is already
+    # resolved, so there is no need to resolve the result again.
     relative_path = test_file.relative_to(COMPILER_TEST_FOLDER)
-    log_path = Path(OUTPUT_FOLDER).joinpath(
-        relative_path.parent, test_file.stem, test_file.stem
-    ).resolve()
+    return os.path.join(
+        output_folder, relative_path.parent, test_file.stem, test_file.stem)
 
-    def relevant_files(component):
-        return f"{log_path}.{component}.stderr.log \n\t {log_path}.{component}.stdout.log"
 
-    # Recreate the directory
-    shutil.rmtree(log_path.parent, ignore_errors=True)
-    log_path.parent.mkdir(parents=True, exist_ok=True)
+def run_test(test_file: Path, log_path: str, expected_result: int) -> Result:
+    """
+    Runs an instance of a test case, checking its exit code against
+    `expected_result`. Artifacts and logs are stored next to `log_path`, see
+    `test_log_path(...)`.
+    """
+    test_name = test_file.relative_to(PROJECT_LOCATION)
 
-    custom_env = os.environ.copy()
-    custom_env["ASAN_OPTIONS"] = "exitcode=0"
+    # Every artifact path this test needs, built once up front
+    log_dir_str = os.path.dirname(log_path)
+    test_file_str = str(test_file)
+    ll_file = f"{log_path}.ll"
+    obj_file = f"{log_path}.o"
+    out_file = f"{log_path}.out"
+    lib_file = os.path.join(log_dir_str, "libfoo.a")
 
-    # Compile
-    return_code, _, timed_out = run_subprocess(
-        cmd=[COMPILER_FILE, "--input", test_file, "--output", f"{log_path}.ll"],
-        timeout=RUN_TIMEOUT_SECONDS,
-        log_path=f"{log_path}.compiler",
-        env=custom_env,
-    )
-    compiler_log_file_str = f"{relevant_files('compiler')}"
-    if return_code != 0:
-        msg = f"\t> Failed to compile testcase: \n\t {compiler_log_file_str}"
-        return Result(
-            test_case_name=test_name, return_code=return_code, passed=False,
-            timeout=timed_out, error_log=msg)
+    # Only called when a test fails, so that passing tests build no messages
+    def relevant_files(component):
+        return f"{log_path}.{component}.stderr.log \n\t {log_path}.{component}.stdout.log"
 
-    # Generate assembly
-    return_code, _, timed_out = run_subprocess(
-        cmd=[
-            "llc", f"{log_path}.ll"
-        ],
-        timeout=RUN_TIMEOUT_SECONDS,
-        log_path=f"{log_path}.llvm",
+    # Logs are overwritten by this run, so only remove the artifacts that
+    # could hide a failure of the stage producing them. `ar rcs` adds to an
+    # existing archive, so an old `libfoo.a` could even be linked in its place.
+    os.makedirs(log_dir_str, exist_ok=True)
+    for stale_file in (ll_file, obj_file, lib_file, out_file):
+        try:
+            os.unlink(stale_file)
+        except FileNotFoundError:
+            pass
+
+    stages = [
+        Stage(
+            description="compile testcase",
+            component="compiler",
+            cmd=[COMPILER_FILE_STR, "--input", test_file_str,
+                 "--output", ll_file],
+            timeout=RUN_TIMEOUT_SECONDS,
+        ),
+        # Intermediate steps to get turn into `.a` file. `llc` reads the
+        # textual IR directly, so there is no need for `llvm-as`
+        Stage(
+            description="LLVM",
+            component="llvm",
+            cmd=["llc", ll_file, "-filetype=obj", "-o", obj_file],
+            timeout=RUN_TIMEOUT_SECONDS,
+        ),
+        Stage(
+            description="archive",
+            component="archive",
+            cmd=["ar", "rcs", lib_file, obj_file],
+            timeout=RUN_TIMEOUT_SECONDS,
+        ),
+        # Link
+        Stage(
+            description="link",
+            component="link",
+            cmd=["rustc", TEST_DRIVER_STR, "-L", log_dir_str,
+                 "-o", out_file],
+            timeout=BUILD_TIMEOUT_SECONDS,
+        ),
+    ]
+
+    # Run every stage in a single shell, stopping at the first that fails
+    return_code, failed, timed_out = run_pipeline(
+        [(stage.cmd, f"{log_path}.{stage.component}", stage.timeout)
+         for stage in stages],
+        env=CUSTOM_ENV,
     )
     if return_code != 0:
-        msg = f"\t> Failed to LLVM: \n\t {compiler_log_file_str} \n\t {relevant_files('llvm')}"
+        stage = stages[failed]
+        msg = f"\t> Failed to {stage.description}: \n\t {relevant_files('compiler')}"
+        if stage.component != "compiler":
+            msg += f" \n\t {relevant_files(stage.component)}"
         return Result(
             test_case_name=test_name, return_code=return_code, passed=False,
             timeout=timed_out, error_log=msg)
 
-    # Intermediate steps to get turn into `.a` file
-    subprocess.run(
-        ["llvm-as", f"{log_path}.ll", "-o", f"{log_path}.bc"], check=True)
-    subprocess.run(
-        ["llc", f"{log_path}.bc", "-filetype=obj", "-o", f"{log_path}.o"],
-        check=True)
-    subprocess.run(["ar", "rcs", log_path.parent.joinpath(
-        "libfoo.a").resolve(), f"{log_path}.o"], check=True)
-
-    # Link
-    subprocess.run(["rustc", TEST_DRIVER, "-L", log_path.parent,
-                   "-o", f"{log_path}.out"], check=True)
-
     # Run
-    expected_result = 0
-    with open(RESULTS_FILE, "r") as f:
-        results = json.load(f)
-        key = str(test_file.relative_to(COMPILER_TEST_FOLDER))
-        expected_result = results[key]
-
     return_code, _, timed_out = run_subprocess(
-        cmd=[f"{log_path}.out"],
+        cmd=[out_file],
         timeout=RUN_TIMEOUT_SECONDS,
         log_path=f"{log_path}.sim",
     )
     if return_code != expected_result:
         msg = (
             f"\t> Failed to run (return code: {return_code}, "
-            f"expected: {expected_result}): \n\t {compiler_log_file_str} "
+            f"expected: {expected_result}): \n\t {relevant_files('compiler')} "
             f"\n\t {relevant_files('sim')}"
         )
         return Result(
@@ -148,6 +207,24 @@ def run_test(test_file: Path) -> Result:
     )
 
 
+def init_worker(expected: dict):
+    """
+    Sets up a process to run tests with `run_test_worker(...)`, given the
+    contents of RESULTS_FILE.
+    """
+    global WORKER_EXPECTED_RESULTS
+    WORKER_EXPECTED_RESULTS = expected
+
+
+def run_test_worker(test_file: Path, log_path: str) -> Result:
+    """
+    Runs `run_test(...)` against the expected result set up by
+    `init_worker(...)`.
+    """
+    key = str(test_file.relative_to(COMPILER_TEST_FOLDER))
+    return run_test(test_file, log_path, WORKER_EXPECTED_RESULTS[key])
+
+
 def run_subprocess(
     cmd: List[str],
     timeout: int,
@@ -179,14 +256,120 @@ def run_subprocess(
         return e.returncode, f"{e.cmd} failed with return code {e.returncode}", False
     except subprocess.TimeoutExpired as e:
         return TIMEOUT_RETURNCODE, f"{e.cmd} took more than {e.timeout}", True
+    finally:
+        # Do not leak file descriptors across hundreds of tests
+        if log_path and not silent:
+            stdout.close()
+            stderr.close()
 
     return 0, "", False
 
 
+def run_pipeline(
+    stages: List[Tuple[List, str, int]],
+    env: Optional[dict] = None,
+) -> tuple[int, int, bool]:
+    """
+    Runs each (cmd, log_path, timeout) of `stages` in order, within a single
+    `bash -c "a && b && ..."`, saving a fork/exec per stage. Stops at the
+    first failing stage, or at the first stage to run for longer than its own
+    timeout.
+
+    The output of each stage is logged as in `run_subprocess(...)`.
+
+    Returns tuple of (return_code: int, stage: int, timed_out: bool), where
+    stage is the index of the last stage that was started.
+    """
+    # The shell announces each stage on its stdout before starting it, which
+    # is how the timeouts are kept per stage
+    commands = []
+    for index, (cmd, log_path, _) in enumerate(stages):
+        commands.append(
+            f"echo {index} && {shlex.join(os.fspath(arg) for arg in cmd)}"
+            f" >{shlex.quote(f'{log_path}.stdout.log')}"
+            f" 2>{shlex.quote(f'{log_path}.stderr.log')}"
+        )
+
+    # In its own session, so that a stage which times out can be killed
+    # together with the shell, rather than being left running
+    process = subprocess.Popen(
+        ["bash", "-c", " && ".join(commands)],
+        env=env, stdout=subprocess.PIPE, start_new_session=True,
+    )
+
+    stage = 0
+    deadline = time.monotonic() + stages[0][2]
+    pending = b""
+    with process.stdout:
+        fd = process.stdout.fileno()
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not select.select([fd], [], [], remaining)[0]:
+                os.killpg(process.pid, signal.SIGKILL)
+                process.wait()
+                return TIMEOUT_RETURNCODE, stage, True
+
+            chunk = os.read(fd, 64)
+            if not chunk:
+                break
+
+            *announced, pending = (pending + chunk).split(b"\n")
+            if announced:
+                stage = int(announced[-1])
+                deadline = time.monotonic() + stages[stage][2]
+
+    # The shell closed its stdout, so it is exiting
+    return process.wait(), stage, False
+
+
+def newer_than(path: str, mtime_ns: int) -> bool:
+    """
+    Whether `path`, or any file below it, was modified after `mtime_ns`.
+    Stops at the first newer file found.
+    """
+    try:
+        if os.stat(path).st_mtime_ns > mtime_ns:
+            return True
+    except FileNotFoundError:
+        return False
+
+    if not os.path.isdir(path):
+        return False
+
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                if newer_than(entry.path, mtime_ns):
+                    return True
+            elif entry.stat().st_mtime_ns > mtime_ns:
+                return True
+
+    return False
+
+
+def compiler_is_fresh() -> bool:
+    """
+    Whether the compiler binary is newer than all of its sources, in which case
+    `cargo build` has nothing to do.
+    """
+    try:
+        compiler_mtime_ns = os.stat(COMPILER_FILE_STR).st_mtime_ns
+    except FileNotFoundError:
+        return False
+
+    return not any(
+        newer_than(str(source), compiler_mtime_ns) for source in COMPILER_SOURCES
+    )
+
+
 def build(silent: bool) -> bool:
     """
     Wrapper for `cargo build`
     """
+    if compiler_is_fresh():
+        print(GREEN + "Compiler is up to date, skipping build..." + RESET)
+        return True
+
     print(GREEN + "Building compiler..." + RESET)
 
     return_code, error_message, _ = run_subprocess(
@@ -202,24 +385,204 @@ def build(silent: bool) -> bool:
     return True
 
 
+def find_tests(directory: Path) -> List[Path]:
+    """
+    Finds every test case below `directory`, sorted by (folder, file) name.
+    The test driver itself is skipped.
+    """
+    tests = []
+    for root, _, files in os.walk(os.path.realpath(directory)):
+        for name in files:
+            if name.endswith(".rs") and name != "test.rs":
+                tests.append(os.path.join(root, name))
+
+    tests.sort(key=lambda x: (
+        os.path.basename(os.path.dirname(x)), os.path.basename(x)))
+
+    return [Path(test) for test in tests]
+
+
+def file_hash(path: str) -> str:
+    """
+    Hashes the contents of the file at `path`.
+    """
+    digest = hashlib.blake2b()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+def test_fingerprint(
+    compiler_hash: str, driver_hash: str, test_file: Path, expected_result: int
+) -> str:
+    """
+    Identifies a run of `test_file`: if this is unchanged since the test last
+    passed, it would pass again.
+    """
+    return (f"{compiler_hash}:{driver_hash}:"
+            f"{os.stat(test_file).st_mtime_ns}:{expected_result}")
+
+
+def load_json(path: Path) -> dict:
+    """
+    Parses the JSON file at `path`, using orjson if it is installed.
+    """
+    if orjson is not None:
+        with open(path, "rb") as f:
+            return orjson.loads(f.read())
+
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def load_test_cache(output_folder: Path) -> dict:
+    """
+    Loads the fingerprints of the tests that passed in previous runs.
+    """
+    try:
+        return load_json(output_folder.joinpath(TEST_CACHE_FILE_NAME))
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def save_test_cache(output_folder: Path, cache: dict):
+    """
+    Saves the fingerprints of the tests that passed in this run.
+    """
+    cache_file = output_folder.joinpath(TEST_CACHE_FILE_NAME)
+    if orjson is not None:
+        with open(cache_file, "wb") as f:
+            f.write(orjson.dumps(
+                cache, option=orjson.OPT_INDENT_2 | orjson.OPT_SORT_KEYS))
+        return
+
+    with open(cache_file, "w") as f:
+        json.dump(cache, f, indent=2, sort_keys=True)
+
+
+def map_tests(
+    fn: Callable,
+    *iterables,
+    multithreading: bool,
+    initializer: Optional[Callable] = None,
+    initargs: tuple = (),
+) -> Iterator[Tuple[int, Any]]:
+    """
+    Lazily maps `fn` over the tests, yielding (index, result) pairs. With
+    `multithreading`, the tests are spread over a pool of processes and the
+    pairs are yielded as soon as each test finishes, so not in order.
+
+    `initializer(*initargs)` is called once in every process running `fn`,
+    to set up state shared by all of its tests.
+    """
+    if not multithreading:
+        if initializer is not None:
+            initializer(*initargs)
+        yield from enumerate(map(fn, *iterables))
+        return
+
+    # Leave some headroom for the rest of the system. Workers spend most of
+    # their time waiting on their subprocesses though, so keep more test
+    # pipelines in flight than there are cores: one test's `llc` can then use
+    # the core left idle while another test waits on `rustc`.
+    cores = max(1, (os.cpu_count() or 1) - 2)
+    max_workers = cores * PIPELINES_PER_CORE
+    with ProcessPoolExecutor(
+        max_workers=max_workers, initializer=initializer, initargs=initargs
+    ) as executor:
+        futures = {
+            executor.submit(fn, *args): index
+            for index, args in enumerate(zip(*iterables))
+        }
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+
+
 def run_tests(args):
     """
     Runs tests and prints the results.
     """
-    tests = list(Path(args.dir).resolve().rglob("*.rs"))
-    tests = sorted(tests, key=lambda x: (x.parent.name, x.name))
+    tests = find_tests(args.dir)
+
+    # Load the expected results once, rather than once per test
+    expected = load_json(RESULTS_FILE)
+    keys = [str(test.relative_to(COMPILER_TEST_FOLDER)) for test in tests]
+    expected_results = [expected[key] for key in keys]
+
+    # In incremental mode, tests that passed against this exact compiler
+    # binary and test driver, and have not been touched since, are not run again
+    cache = {}
+    fingerprints = [None] * len(tests)
+    if args.incremental:
+        cache = load_test_cache(args.output)
+        compiler_hash = file_hash(COMPILER_FILE_STR)
+        # Every test is linked against the test driver
+        driver_hash = file_hash(TEST_DRIVER_STR)
+        fingerprints = [
+            test_fingerprint(compiler_hash, driver_hash, test, expected_result)
+            for test, expected_result in zip(tests, expected_results)
+        ]
+
+    cached = [
+        fingerprint is not None and cache.get(key) == fingerprint
+        for key, fingerprint in zip(keys, fingerprints)
+    ]
+    pending = [i for i in range(len(tests)) if not cached[i]]
+
+    # Paths are worked out here, so that workers are only sent strings. The
+    # expected results are sent once per worker, rather than once per test.
+    pending_results = map_tests(
+        run_test_worker,
+        [tests[i] for i in pending],
+        [test_log_path(tests[i], args.output) for i in pending],
+        multithreading=args.multithreading,
+        initializer=init_worker,
+        initargs=(expected,),
+    )
 
-    results = []
+    # In the order of `tests`, whatever order they finish in
+    results = [None] * len(tests)
+    # Keep the entries of tests outside of `args.dir`
+    new_cache = dict(cache)
 
-    for test in tests:
-        if test.name == "test.rs":
-            continue
+    def report(i: int, result: Result):
+        if result.passed and fingerprints[i] is not None:
+            new_cache[keys[i]] = fingerprints[i]
+        else:
+            new_cache.pop(keys[i], None)
 
-        result = run_test(test)
-        results.append(result.passed)
+        results[i] = result.passed
         if not args.short or not result.passed:
             print(result.to_log())
 
+    def cached_result(i: int) -> Result:
+        return Result(
+            test_case_name=tests[i].relative_to(PROJECT_LOCATION),
+            return_code=expected_results[i], passed=True,
+            timeout=False, error_log="")
+
+    # Results are only ever printed from this thread, so they cannot interleave
+    if args.multithreading:
+        # Cached results first, then the rest as soon as each finishes
+        for i in range(len(tests)):
+            if cached[i]:
+                report(i, cached_result(i))
+        for j, result in pending_results:
+            report(pending[j], result)
+    else:
+        # Pending results come in order, so keep everything in order
+        for i in range(len(tests)):
+            if cached[i]:
+                report(i, cached_result(i))
+            else:
+                _, result = next(pending_results)
+                report(i, result)
+
+    if args.incremental:
+        save_test_cache(args.output, new_cache)
+
     passing = sum(results)
     total = len(results)
 
@@ -233,8 +596,14 @@ def test(args):
     """
     Handles the test subcommand.
     """
-    shutil.rmtree(OUTPUT_FOLDER, ignore_errors=True)
-    Path(OUTPUT_FOLDER).mkdir(parents=True, exist_ok=True)
+    args.output = args.output.resolve()
+
+    # Incremental runs need the logs and the cache of the previous run. Only
+    # the default folder is ever wiped: a folder given with `--output` may hold
+    # anything, and each test already clears its own stale artifacts.
+    if not args.incremental and args.output == OUTPUT_FOLDER:
+        shutil.rmtree(args.output, ignore_errors=True)
+    args.output.mkdir(parents=True, exist_ok=True)
 
     if not build(args.short):
         return
@@ -242,47 +611,71 @@ def test(args):
     run_tests(args)
 
 
+def update_test(test_file: Path) -> Tuple[str, Optional[int]]:
+    """
+    Finds the exit code of a test case when compiled by `rustc`.
+
+    Returns tuple of (key in RESULTS_FILE: str, return_code: Optional[int]),
+    where return_code is None if the test case failed to build.
+    """
+    relative_path = test_file.relative_to(COMPILER_TEST_FOLDER)
+
+    # Each test gets its own temporary folder, so that tests can be updated in
+    # parallel, and `rustc`'s libfoo.a is never picked up by the test command
+    with tempfile.TemporaryDirectory(prefix="rrc-update-") as out_dir:
+        executable = os.path.join(out_dir, "test")
+
+        try:
+            # Create a static library
+            subprocess.run(["rustc", "--crate-type=staticlib",
+                           "--crate-name=foo", "--out-dir", out_dir, test_file],
+                           timeout=BUILD_TIMEOUT_SECONDS, check=True,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+            # Create the executable
+            subprocess.run(["rustc", TEST_DRIVER_STR, "-L", out_dir,
+                           "-o", executable],
+                           timeout=BUILD_TIMEOUT_SECONDS, check=True,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        except (subprocess.CalledProcessError, subprocess.TimeoutExpired):
+            # Running a stale executable would record a bogus result
+            return str(relative_path), None
+
+        # Run the executable
+        return_code, _, _ = run_subprocess(
+            [executable],
+            RUN_TIMEOUT_SECONDS
+        )
+
+    return str(relative_path), return_code
+
+
 def update(args):
     """
     Handles the update subcommand.
     """
     # Get the result of the test
-    tests = list(Path(args.dir).resolve().rglob("*.rs"))
-    tests = sorted(tests, key=lambda x: (x.parent.name, x.name))
+    tests = find_tests(args.dir)
 
     # Load the pre-existing data
     if os.path.exists(RESULTS_FILE):
-        with open(RESULTS_FILE, "r") as f:
-            results = json.load(f)
+        results = load_json(RESULTS_FILE)
     else:
         results = {}
 
     start_time = time.time()
-    for test in tests:
-        if test.name == "test.rs":
+    for i, (key, return_code) in map_tests(
+        update_test, tests, multithreading=args.multithreading
+    ):
+        print(f"Checking {tests[i].relative_to(PROJECT_LOCATION)}")
+        if return_code is None:
+            print(f"{RED}\t> Failed to build, skipping{RESET}")
             continue
 
-        print(f"Checking {test.relative_to(PROJECT_LOCATION)}")
-
-        # Create a static library
-        subprocess.run(["rustc", "--crate-type=staticlib",
-                       "--crate-name=foo", test], timeout=BUILD_TIMEOUT_SECONDS,
-                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-
-        # Create the executable
-        subprocess.run(
-            ["rustc", TEST_DRIVER, "-L", "."],
-            BUILD_TIMEOUT_SECONDS
-        )
-
-        # Run the executable
-        return_code, _, _ = run_subprocess(
-            ["./test"],
-            RUN_TIMEOUT_SECONDS
-        )
-        results[str(test.relative_to(COMPILER_TEST_FOLDER))] = return_code
+        results[key] = return_code
 
-    # Write the results to the file, overwriting the old one
+    # Write the results to the file, overwriting the old one. This sticks to
+    # `json`, as orjson cannot keep the file's 4-space indentation.
     with open(RESULTS_FILE, "w") as f:
         json.dump(results, f, indent=4, sort_keys=True)
 
@@ -313,9 +706,18 @@ def parse_args() -> argparse.Namespace:
         "-m", "--multithreading",
         action="store_true",
         default=False,
-        help="Use multiple threads to run tests. This will make it faster, "
+        help="Use multiple processes to run tests. This will make it faster, "
         "but order is not guaranteed. Should only be used for speed."
     )
+    test_subparser.add_argument(
+        "-i", "--incremental", action="store_true", default=False,
+        help="Skip tests that passed last time, if neither the test nor the "
+        "compiler has changed since.")
+    test_subparser.add_argument(
+        "-o", "--output", default=OUTPUT_FOLDER, type=Path,
+        help="(Optional) folder for the build artifacts and logs of the tests. "
+        "Point this at a tmpfs (e.g. /dev/shm/rrc) to keep the intermediate "
+        "files of every test off the disk.")
     test_subparser.add_argument(
         "-s", "--short", action="store_true", default=False,
         help="Disable verbose output into the terminal. Note that all logs will "
@@ -327,26 +729,25 @@ def parse_args() -> argparse.Namespace:
         "dir", nargs="?", default=COMPILER_TEST_FOLDER, type=Path,
         help="(Optional) paths to the compiler test folders. Use this to select "
         "certain tests. Leave blank to run all tests.")
+    update_subparser.add_argument(
+        "-m", "--multithreading",
+        action="store_true",
+        default=False,
+        help="Use multiple processes to update the results. This will make it "
+        "faster, but order is not guaranteed."
+    )
     update_subparser.set_defaults(func=update)
 
     return parser.parse_args()
 
 
 def main():
+    # Show progress as it happens, even when piped into a file (e.g. on CI)
+    sys.stdout.reconfigure(line_buffering=True)
+
     args = parse_args()
     args.func(args)
 
-    # Cleanup
-    try:
-        os.remove(PROJECT_LOCATION / "test")
-    except FileNotFoundError:
-        pass
-
-    try:
-        os.remove(PROJECT_LOCATION / "libfoo.a")
-    except FileNotFoundError:
-        pass
-
 
 if __name__ == "__main__":
     try: